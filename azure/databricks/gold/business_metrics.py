@@ -1,9 +1,31 @@
 from pyspark.sql import SparkSession
+from pyspark.sql.window import Window
 from pyspark.sql.functions import (
     col, sum, count, avg, window, 
-    datediff, current_timestamp, year, month
+    datediff, current_timestamp, year, month,
+    countDistinct, when, dense_rank, desc,
+    lit, max, least, current_date, to_date, date_trunc, hll_sketch_agg,
+    hll_union_agg, hll_sketch_estimate
 )
 from delta.tables import DeltaTable
+from datetime import timedelta
+from functools import reduce
+from metrics_cache import MetricsQueryCache, ROLLUP_PATH
+
+ROLLUP_GRAINS = ["day", "week", "month"]
+
+# Days before the last loaded day (capped at today) that every rollup run
+# recomputes. Silver orders_enriched is rewritten in full, so corrections,
+# cancellations and late rows within this window are picked up; older changes
+# need a full rebuild (delete gold/metrics_daily).
+ROLLUP_LOOKBACK_DAYS = 35
+
+# Rollup dimension name -> daily base column (None for the overall total)
+ROLLUP_DIMENSIONS = {
+    "overall": None,
+    "merchant": "merchant_id",
+    "user_type": "user_type"
+}
 
 class BusinessMetricsTransformation:
     def __init__(self):
@@ -27,7 +49,7 @@ class BusinessMetricsTransformation:
                 sum("total_price").alias("total_revenue"),
                 count("order_id").alias("total_orders"),
                 avg("total_price").alias("average_order_value"),
-                count(distinct("user_id")).alias("unique_customers")
+                countDistinct("user_id").alias("unique_customers")
             )
 
         # 2. User Growth Metrics
@@ -65,4 +87,93 @@ class BusinessMetricsTransformation:
         merchant_rankings.write \
             .format("delta") \
             .mode("overwrite") \
-            .save("/data/gold/merchant_rankings") 
\ No newline at end of file
+            .save("/data/gold/merchant_rankings")
+
+        self.update_rollups()
+
+    def update_rollups(self):
+        """Incrementally maintain the day/week/month rollup from mergeable daily aggregates"""
+        daily_path = "/data/gold/metrics_daily"
+        rollup_path = ROLLUP_PATH
+
+        # Recompute a bounded lookback window ending at the last loaded day, capped
+        # at today so a bad far-future created_at cannot push it past real data
+        since = None
+        if DeltaTable.isDeltaTable(self.spark, daily_path):
+            last_loaded = self.spark.read.format("delta").load(daily_path) \
+                .agg(least(max("order_date"), current_date())).first()[0]
+            if last_loaded is not None:
+                since = last_loaded - timedelta(days=ROLLUP_LOOKBACK_DAYS)
+
+        orders = self.spark.read.format("delta").load("/data/silver/orders_enriched")
+        if since is not None:
+            orders = orders.filter(to_date("created_at") >= lit(since))
+        users = self.spark.read.format("delta").load("/data/silver/users_enriched") \
+            .select("user_id", "user_type")
+
+        # Daily base at the finest grain; the customer HLL sketch stays mergeable
+        daily = orders \
+            .join(users, "user_id", "left") \
+            .groupBy(to_date("created_at").alias("order_date"), "merchant_id", "user_type") \
+            .agg(
+                sum("total_price").alias("total_revenue"),
+                count("order_id").alias("total_orders"),
+                hll_sketch_agg("user_id").alias("customers_sketch")
+            )
+
+        daily_writer = daily.write.format("delta").mode("overwrite")
+        if since is not None:
+            daily_writer = daily_writer.option("replaceWhere", f"order_date >= '{since}'")
+        daily_writer.save(daily_path)
+
+        # Periods containing the reloaded days
+        period_starts = None
+        if since is not None:
+            period_starts = {
+                "day": since,
+                "week": since - timedelta(days=since.weekday()),
+                "month": since.replace(day=1)
+            }
+
+        daily_base = self.spark.read.format("delta").load(daily_path)
+        if period_starts is not None:
+            daily_base = daily_base.filter(col("order_date") >= lit(min(period_starts.values())))
+
+        rollups = []
+        for grain in ROLLUP_GRAINS:
+            period = col("order_date") if grain == "day" \
+                else date_trunc(grain, col("order_date")).cast("date")
+            grain_base = daily_base
+            if period_starts is not None:
+                grain_base = grain_base.filter(period >= lit(period_starts[grain]))
+
+            for dimension, column in ROLLUP_DIMENSIONS.items():
+                value = lit(None).cast("string") if column is None else col(column).cast("string")
+                rollups.append(
+                    grain_base
+                    .groupBy(period.alias("period_start"), value.alias("dimension_value"))
+                    .agg(
+                        sum("total_revenue").alias("total_revenue"),
+                        sum("total_orders").alias("total_orders"),
+                        hll_union_agg("customers_sketch").alias("customers_sketch")
+                    )
+                    .withColumn("grain", lit(grain))
+                    .withColumn("dimension", lit(dimension))
+                )
+
+        rollup = reduce(lambda left, right: left.unionByName(right), rollups) \
+            .withColumn("unique_customers", hll_sketch_estimate("customers_sketch")) \
+            .withColumn("average_order_value", col("total_revenue") / col("total_orders"))
+
+        rollup_writer = rollup.write.format("delta").mode("overwrite")
+        if period_starts is not None:
+            rollup_writer = rollup_writer.option("replaceWhere", " OR ".join(
+                f"(grain = '{grain}' AND period_start >= '{start}')"
+                for grain, start in period_starts.items()
+            ))
+        rollup_writer.save(rollup_path)
+
+        # Invalidate cached dashboard results for the previous gold version
+        version = DeltaTable.forPath(self.spark, rollup_path).history(1) \
+            .select("version").first()[0]
+        MetricsQueryCache(self.spark).publish_gold_version(version)
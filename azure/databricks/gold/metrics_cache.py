@@ -0,0 +1,85 @@
+import json
+import os
+import time
+
+# Bumped by BusinessMetricsTransformation after every successful gold write
+GOLD_VERSION_KEY = "metrics:gold_version"
+ROLLUP_PATH = "/data/gold/metrics_rollup"
+
+
+class MetricsQueryCache:
+    """Cache dashboard query results keyed by view, time range and gold version.
+
+    Entries embed the current gold version in their key, so a new version
+    invalidates every cached result at once; stale entries simply expire.
+    With REDIS_URL set the cache and version are shared through Redis.
+    Otherwise results are cached per process and the version is read from the
+    metrics_rollup Delta log (at most every version_check_seconds), which
+    needs a Spark session.
+    """
+
+    def __init__(self, spark=None, ttl_seconds=300, version_check_seconds=5):
+        self.spark = spark
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self.redis = None
+        self.memory_cache = {}
+        self.cached_version = None
+        self.version_checked_at = 0.0
+
+        if os.getenv('REDIS_URL'):
+            import redis
+            self.redis = redis.Redis.from_url(os.getenv('REDIS_URL'))
+        elif spark is None:
+            raise ValueError("MetricsQueryCache needs REDIS_URL or a Spark session to track gold versions")
+
+    def gold_version(self):
+        """Return the latest gold version"""
+        if self.redis is not None:
+            return int(self.redis.get(GOLD_VERSION_KEY) or 0)
+
+        now = time.monotonic()
+        if self.cached_version is None or now - self.version_checked_at >= self.version_check_seconds:
+            from delta.tables import DeltaTable
+            self.cached_version = DeltaTable.forPath(self.spark, ROLLUP_PATH).history(1) \
+                .select("version").first()[0]
+            self.version_checked_at = now
+        return self.cached_version
+
+    def publish_gold_version(self, version):
+        """Record a new gold version in Redis, invalidating all cached results.
+
+        In memory mode readers take the version from the Delta log, so there is
+        nothing to publish.
+        """
+        if self.redis is not None:
+            self.redis.set(GOLD_VERSION_KEY, version)
+
+    def get_or_query(self, view, start, end, query_fn):
+        """Return the cached result for view over [start, end], running query_fn on a miss"""
+        key = f"metrics:v{self.gold_version()}:{view}:{start}:{end}"
+
+        if self.redis is not None:
+            cached = self.redis.get(key)
+            if cached is not None:
+                return json.loads(cached)
+        else:
+            cached = self.memory_cache.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return json.loads(cached[1])
+
+        # Results are always returned through JSON, so hits and misses have the same
+        # shape (dates, datetimes and Decimals come back as strings)
+        serialized = json.dumps(query_fn(view, start, end), default=str)
+
+        if self.redis is not None:
+            self.redis.setex(key, self.ttl_seconds, serialized)
+        else:
+            # Evict expired entries, including those of superseded gold versions
+            now = time.monotonic()
+            self.memory_cache = {
+                cache_key: entry for cache_key, entry in self.memory_cache.items()
+                if entry[0] > now
+            }
+            self.memory_cache[key] = (now + self.ttl_seconds, serialized)
+        return json.loads(serialized)
@@ -0,0 +1,104 @@
+from pyspark.sql import Observation
+from pyspark.sql.functions import (
+    col, count, sum, when, min, max, avg, stddev,
+    approx_count_distinct, xxhash64
+)
+from pyspark.sql.types import (
+    StructType, StructField, StringType, DoubleType, LongType, TimestampType
+)
+from datetime import datetime, timezone
+
+# Relative standard deviation of the key cardinality sketch
+KEY_RSD = 0.01
+
+QUALITY_CHECKS_SCHEMA = StructType([
+    StructField("table_name", StringType(), False),
+    StructField("column_name", StringType(), True),
+    StructField("check_type", StringType(), False),
+    StructField("metric_name", StringType(), False),
+    StructField("metric_value", DoubleType(), True),
+    StructField("row_count", LongType(), False),
+    StructField("check_timestamp", TimestampType(), False)
+])
+
+
+class DataQualityProfiler:
+    """Profile a silver DataFrame with observable metrics while it is written.
+
+    Null counts, a duplicate-key estimate and numeric distribution stats are
+    collected by the same Spark job that writes the table, so no extra scan
+    of the input or output is needed. Distinct aggregates are not allowed in
+    observed metrics, so duplicates are estimated from a HyperLogLog sketch of
+    the key and recorded alongside the sketch's error bound.
+    """
+
+    def __init__(self, spark, table_name, key_columns, stats_columns=None):
+        self.spark = spark
+        self.table_name = table_name
+        self.key_columns = key_columns
+        self.stats_columns = stats_columns or []
+        self.observation = Observation(f"{table_name}_quality")
+        self.columns = []
+
+    def observe(self, df):
+        """Attach the quality metrics to df; they are filled in by its first action"""
+        self.columns = df.columns
+        metrics = [
+            count("*").alias("row_count"),
+            approx_count_distinct(xxhash64(*self.key_columns), KEY_RSD).alias("distinct_keys")
+        ]
+        for name in self.columns:
+            metrics.append(sum(when(col(name).isNull(), 1).otherwise(0)).alias(f"null__{name}"))
+        for name in self.stats_columns:
+            value = col(name).cast("double")
+            metrics.extend([
+                min(value).alias(f"min__{name}"),
+                max(value).alias(f"max__{name}"),
+                avg(value).alias(f"mean__{name}"),
+                stddev(value).alias(f"stddev__{name}")
+            ])
+        return df.observe(self.observation, *metrics)
+
+    def collect(self):
+        """Return the observed metrics as quality_checks records"""
+        observed = self.observation.get
+        row_count = observed["row_count"]
+        check_timestamp = datetime.now(timezone.utc)
+
+        def record(column_name, check_type, metric_name, value):
+            return (
+                self.table_name, column_name, check_type, metric_name,
+                float(value) if value is not None else None, row_count, check_timestamp
+            )
+
+        records = [
+            record(name, "null_check", "null_count", observed[f"null__{name}"] or 0)
+            for name in self.columns
+        ]
+
+        # The sketch can over- or undercount distinct keys, so a clean table can show
+        # a positive estimate; only estimates above the ~3 sigma error bound are duplicates
+        key_name = ",".join(self.key_columns)
+        duplicates = row_count - observed["distinct_keys"]
+        records.append(record(
+            key_name, "duplicate_check", "duplicate_count_estimate",
+            duplicates if duplicates > 0 else 0
+        ))
+        records.append(record(
+            key_name, "duplicate_check", "duplicate_count_error", 3 * KEY_RSD * row_count
+        ))
+
+        for name in self.stats_columns:
+            for stat in ("min", "max", "mean", "stddev"):
+                records.append(record(name, "distribution", stat, observed[f"{stat}__{name}"]))
+
+        return records
+
+    def write(self, path="/data/silver/quality_checks"):
+        """Append the collected metrics to silver.quality_checks and return them"""
+        records = self.collect()
+        self.spark.createDataFrame(records, QUALITY_CHECKS_SCHEMA).write \
+            .format("delta") \
+            .mode("append") \
+            .save(path)
+        return records
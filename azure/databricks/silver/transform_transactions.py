@@ -1,6 +1,7 @@
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, explode, sum, count, window
+from pyspark.sql.functions import col, explode, sum, count, avg, window
 from delta.tables import DeltaTable
+from quality_profiler import DataQualityProfiler
 
 class TransactionTransformation:
     def __init__(self):
@@ -34,13 +35,24 @@ class TransactionTransformation:
                 "created_at"
             )
 
+        # Profile quality in the same pass as the write
+        profiler = DataQualityProfiler(
+            self.spark,
+            "orders_enriched",
+            ["order_id", "product_id"],
+            stats_columns=["quantity", "price_per_unit", "total_price"]
+        )
+        observed = profiler.observe(enriched_orders)
+
         # Write enriched orders to silver
-        enriched_orders.write \
+        observed.write \
             .format("delta") \
             .mode("overwrite") \
             .partitionBy("created_at") \
             .save("/data/silver/orders_enriched")
 
+        quality_metrics = profiler.write()
+
         # Create merchant performance summary
         merchant_summary = enriched_orders \
             .groupBy("merchant_id") \
@@ -54,4 +66,6 @@ class TransactionTransformation:
         merchant_summary.write \
             .format("delta") \
             .mode("overwrite") \
-            .save("/data/silver/merchant_performance") 
\ No newline at end of file
+            .save("/data/silver/merchant_performance")
+
+        return quality_metrics
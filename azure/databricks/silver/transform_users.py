@@ -1,6 +1,7 @@
 from pyspark.sql import SparkSession
-from pyspark.sql.functions import col, to_timestamp, current_timestamp, when, lit
+from pyspark.sql.functions import col, to_timestamp, current_timestamp, when, lit, lower, count, max
 from delta.tables import DeltaTable
+from quality_profiler import DataQualityProfiler
 
 class UserTransformation:
     def __init__(self):
@@ -40,13 +41,19 @@ class UserTransformation:
                 "processed_timestamp"
             )
 
+        # Profile quality in the same pass as the write
+        profiler = DataQualityProfiler(self.spark, "users_enriched", ["user_id"])
+        observed = profiler.observe(enriched_users)
+
         # Write to silver layer
-        enriched_users.write \
+        observed.write \
             .format("delta") \
             .mode("overwrite") \
             .partitionBy("user_type") \
             .save("/data/silver/users_enriched")
 
+        quality_metrics = profiler.write()
+
         # Create user activity summary
         activity_summary = bronze_activities \
             .groupBy("user_id") \
@@ -59,4 +66,6 @@ class UserTransformation:
         activity_summary.write \
             .format("delta") \
             .mode("overwrite") \
-            .save("/data/silver/user_activity_summary") 
\ No newline at end of file
+            .save("/data/silver/user_activity_summary")
+
+        return quality_metrics
@@ -48,29 +48,51 @@ class PipelineMonitor:
     def monitor_data_quality(self):
         """Monitor data quality metrics"""
         try:
+            # Metrics are written by the silver jobs' DataQualityProfiler. Each run
+            # profiles the whole (overwritten) table, so only the latest run per
+            # table/column/metric is used rather than summing snapshots.
+            latest_checks = """
+            WITH latest AS (
+                SELECT 
+                    table_name,
+                    column_name,
+                    check_type,
+                    metric_name,
+                    metric_value,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY table_name, column_name, metric_name
+                        ORDER BY check_timestamp DESC
+                    ) as run_rank
+                FROM silver.quality_checks
+                WHERE check_type = '{check_type}'
+                AND check_timestamp > DATEADD(hour, -24, GETUTCDATE())
+            )
+            """
+
             # Check for null values
-            null_check_query = """
+            null_check_query = latest_checks.format(check_type='null_check') + """
             SELECT 
                 table_name,
                 column_name,
-                COUNT(*) as null_count
-            FROM silver.quality_checks
-            WHERE check_type = 'null_check'
-            AND check_timestamp > DATEADD(hour, -24, GETUTCDATE())
-            GROUP BY table_name, column_name
-            HAVING COUNT(*) > 0
+                metric_value as null_count
+            FROM latest
+            WHERE run_rank = 1
+            AND metric_value > 0
             """
 
-            # Check for duplicates
-            duplicate_check_query = """
+            # Check for duplicates. The estimate comes from a sketch and is positive on
+            # clean tables about half the time, so only estimates above the error bound alert.
+            duplicate_check_query = latest_checks.format(check_type='duplicate_check') + """
             SELECT 
                 table_name,
-                COUNT(*) as duplicate_count
-            FROM silver.quality_checks
-            WHERE check_type = 'duplicate_check'
-            AND check_timestamp > DATEADD(hour, -24, GETUTCDATE())
-            GROUP BY table_name
-            HAVING COUNT(*) > 0
+                column_name as key_columns,
+                MAX(CASE WHEN metric_name = 'duplicate_count_estimate' THEN metric_value END) as duplicate_count_estimate,
+                MAX(CASE WHEN metric_name = 'duplicate_count_error' THEN metric_value END) as duplicate_count_error
+            FROM latest
+            WHERE run_rank = 1
+            GROUP BY table_name, column_name
+            HAVING MAX(CASE WHEN metric_name = 'duplicate_count_estimate' THEN metric_value END)
+                > MAX(CASE WHEN metric_name = 'duplicate_count_error' THEN metric_value END)
             """
 
             return {
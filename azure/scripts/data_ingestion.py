@@ -2,6 +2,7 @@ from azure.eventhub import EventHubConsumerClient
 from azure.storage.filedatalake import DataLakeServiceClient
 import asyncio
 import json
+from datetime import datetime
 import os
 from dotenv import load_dotenv
 
@@ -15,23 +16,25 @@ class DataIngestionPipeline:
 
     async def process_postgresql_event(self, event):
         """Process CDC events from PostgreSQL"""
-        event_body = event.body_as_json()
+        formatted_data = self.format_postgresql_event(event.body_as_json())
         
+        # Store in Data Lake
+        await self.store_in_datalake('postgresql', formatted_data['table'], formatted_data)
+
+    @staticmethod
+    def format_postgresql_event(event_body):
+        """Format a PostgreSQL CDC envelope for bronze storage"""
         # Extract table name and operation type
         table_name = event_body.get('table')
         operation = event_body.get('operation')  # INSERT, UPDATE, DELETE
         
-        # Format data for storage
-        formatted_data = {
+        return {
             'source': 'postgresql',
             'table': table_name,
             'operation': operation,
             'data': event_body.get('data'),
             'timestamp': event_body.get('timestamp')
         }
-        
-        # Store in Data Lake
-        await self.store_in_datalake('postgresql', table_name, formatted_data)
 
     async def process_mongodb_event(self, event):
         """Process Change Stream events from MongoDB"""
@@ -56,27 +59,31 @@ class DataIngestionPipeline:
     async def store_in_datalake(self, source, entity_name, data):
         """Store captured changes in Data Lake"""
         try:
-            # Create Data Lake service client
-            service_client = DataLakeServiceClient.from_connection_string(
-                self.storage_connection_str)
-            
-            # Get file system client
-            file_system_client = service_client.get_file_system_client(
-                file_system="bronze")
-            
-            # Create path with date partitioning
-            from datetime import datetime
-            date = datetime.now()
-            path = f"{source}/{entity_name}/year={date.year}/month={date.month}/day={date.day}/data_{date.timestamp()}.json"
-            
-            # Create and write to file
-            file_client = file_system_client.create_file(path)
-            file_client.append_data(json.dumps(data), 0, len(json.dumps(data)))
-            file_client.flush_data(len(json.dumps(data)))
+            self.write_to_datalake(source, entity_name, [data])
             
         except Exception as e:
             print(f"Error storing data in Data Lake: {str(e)}")
 
+    def write_to_datalake(self, source, entity_name, records):
+        """Write records as JSON Lines to the bronze file system, raising on failure"""
+        # Create Data Lake service client
+        service_client = DataLakeServiceClient.from_connection_string(
+            self.storage_connection_str)
+        
+        # Get file system client
+        file_system_client = service_client.get_file_system_client(
+            file_system="bronze")
+        
+        # Create path with date partitioning
+        date = datetime.now()
+        path = f"{source}/{entity_name}/year={date.year}/month={date.month}/day={date.day}/data_{date.timestamp()}.json"
+        
+        # Create and write to file; flush_data commits the file durably
+        payload = '\n'.join(json.dumps(record) for record in records).encode('utf-8')
+        file_client = file_system_client.create_file(path)
+        file_client.append_data(payload, 0, len(payload))
+        file_client.flush_data(len(payload))
+
     async def start_ingestion(self):
         """Start the ingestion process for both databases"""
         # PostgreSQL consumer
@@ -0,0 +1,240 @@
+from azure.identity import DefaultAzureCredential
+from azure.eventhub import EventHubProducerClient, EventData
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure
+from bson import json_util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from datetime import datetime, timezone
+import argparse
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+from setup_cdc import TRACKED_COLLECTIONS
+
+load_dotenv()
+
+# Server error code when a resume token has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+
+class MongoChangeStreamConsumer:
+    def __init__(self, collections=None, fields=None, batch_size=500,
+                 max_await_time_ms=1000, checkpoint_interval=5.0,
+                 full_document='updateLookup', restart_on_history_lost=False):
+        self.mongo_conn_string = os.getenv('MONGODB_CONNECTION_STRING')
+        self.eventhub_namespace = os.getenv('EVENTHUB_NAMESPACE')
+        self.credential = DefaultAzureCredential()
+
+        self.collections = collections or TRACKED_COLLECTIONS
+        # Optional per-collection list of fullDocument fields to keep
+        self.fields = fields or {}
+        self.batch_size = batch_size
+        self.max_await_time_ms = max_await_time_ms
+        self.checkpoint_interval = checkpoint_interval
+        self.full_document = full_document
+        # Resume from now when a checkpoint is older than the oplog, instead of failing
+        self.restart_on_history_lost = restart_on_history_lost
+
+        self.client = MongoClient(self.mongo_conn_string)
+        self.db = self.client.wastedump
+        self.checkpoints = self.db.changestream_checkpoints
+        self.stop_event = threading.Event()
+
+        self.metrics_lock = threading.Lock()
+        self.metrics = {
+            name: {'events_total': 0, 'events_per_sec': 0.0, 'lag_seconds': 0.0}
+            for name in self.collections
+        }
+
+    def build_pipeline(self, collection):
+        """Filter and project change events server-side"""
+        projection = {
+            '_id': 1,  # the resume token; change streams reject projections that drop it
+            'operationType': 1,
+            'ns': 1,
+            'documentKey': 1,
+            'clusterTime': 1
+        }
+        if collection in self.fields:
+            for field in self.fields[collection]:
+                projection[f'fullDocument.{field}'] = 1
+        else:
+            projection['fullDocument'] = 1
+
+        return [
+            {'$match': {'operationType': {'$in': ['insert', 'update', 'delete']}}},
+            {'$project': projection}
+        ]
+
+    def load_resume_token(self, collection):
+        """Return the last persisted resume token for a collection, if any"""
+        checkpoint = self.checkpoints.find_one({'_id': collection})
+        return checkpoint['resume_token'] if checkpoint else None
+
+    def open_stream(self, collection):
+        """Open a collection's change stream from its persisted resume token"""
+        resume_token = self.load_resume_token(collection)
+        options = {
+            'full_document': self.full_document,
+            'batch_size': self.batch_size,
+            'max_await_time_ms': self.max_await_time_ms
+        }
+
+        try:
+            return self.db[collection].watch(
+                self.build_pipeline(collection), resume_after=resume_token, **options)
+        except OperationFailure as e:
+            if resume_token is None or e.code != CHANGE_STREAM_HISTORY_LOST:
+                raise
+            if not self.restart_on_history_lost:
+                raise RuntimeError(
+                    f"Resume token for {collection} is no longer in the oplog. Backfill "
+                    f"{collection} and rerun with --restart-on-history-lost to resume from now"
+                ) from e
+
+            print(f"WARNING: resume token for {collection} is no longer in the oplog; "
+                  f"restarting from now, events in between must be backfilled")
+            self.checkpoints.delete_one({'_id': collection})
+            return self.db[collection].watch(self.build_pipeline(collection), **options)
+
+    def save_resume_token(self, collection, resume_token, cluster_time):
+        """Persist the resume token once the events before it are sent"""
+        self.checkpoints.replace_one(
+            {'_id': collection},
+            {
+                'resume_token': resume_token,
+                'cluster_time': cluster_time,
+                'updated_at': datetime.now(timezone.utc)
+            },
+            upsert=True
+        )
+
+    def send_to_eventhub(self, producer, changes):
+        """Send change events to the mongodb-changes hub in as few batches as possible"""
+        event_batch = producer.create_batch()
+        for change in changes:
+            event = EventData(json_util.dumps(change, json_options=json_util.RELAXED_JSON_OPTIONS))
+            try:
+                event_batch.add(event)
+            except ValueError:
+                # Batch is full: send it and start a new one
+                producer.send_batch(event_batch)
+                event_batch = producer.create_batch()
+                event_batch.add(event)
+
+        if len(event_batch):
+            producer.send_batch(event_batch)
+
+    def record_metrics(self, collection, count, last_checkpoint, cluster_time):
+        """Update throughput and clusterTime lag for a collection"""
+        with self.metrics_lock:
+            stats = self.metrics[collection]
+            stats['events_total'] += count
+            # Rate over the interval since the previous checkpoint, not a lifetime average
+            elapsed = time.monotonic() - last_checkpoint
+            stats['events_per_sec'] = count / elapsed if elapsed else 0.0
+            # No cluster time means nothing was pending: the stream is caught up
+            if cluster_time is None:
+                stats['lag_seconds'] = 0.0
+            else:
+                stats['lag_seconds'] = (
+                    datetime.now(timezone.utc) - cluster_time.as_datetime()).total_seconds()
+
+        if count:
+            print(
+                f"[{collection}] sent {count} events | {stats['events_per_sec']:.1f} events/sec | "
+                f"lag {stats['lag_seconds']:.2f}s"
+            )
+
+    def consume_collection(self, collection, producer=None):
+        """Read one collection's change stream until stop_event is set"""
+        owns_producer = producer is None
+        if owns_producer:
+            # Event Hub clients are not thread-safe, so each worker gets its own
+            producer = EventHubProducerClient(
+                fully_qualified_namespace=f"{self.eventhub_namespace}.servicebus.windows.net",
+                eventhub_name="mongodb-changes",
+                credential=self.credential
+            )
+
+        last_checkpoint = time.monotonic()
+        batch = []
+        cluster_time = None
+
+        try:
+            with self.open_stream(collection) as stream:
+                while not self.stop_event.is_set() and stream.alive:
+                    # try_next returns None once maxAwaitTimeMS passes with no events
+                    change = stream.try_next()
+                    if change is not None:
+                        batch.append(change)
+                        cluster_time = change.get('clusterTime')
+
+                    # Flush on size or elapsed time, even while events keep arriving
+                    now = time.monotonic()
+                    if len(batch) >= self.batch_size or now - last_checkpoint >= self.checkpoint_interval:
+                        count = len(batch)
+                        if batch:
+                            self.send_to_eventhub(producer, batch)
+                            batch = []
+                        # stream.resume_token also advances on empty batches
+                        # (postBatchResumeToken), keeping idle restarts cheap
+                        self.save_resume_token(collection, stream.resume_token, cluster_time)
+                        # An empty batch means the stream advanced via postBatchResumeToken
+                        # with nothing pending, so it reports no lag
+                        self.record_metrics(
+                            collection, count, last_checkpoint, cluster_time if count else None)
+                        last_checkpoint = now
+
+                # Flush whatever is left before shutting down
+                if batch:
+                    self.send_to_eventhub(producer, batch)
+                    self.save_resume_token(collection, stream.resume_token, cluster_time)
+                    self.record_metrics(collection, len(batch), last_checkpoint, cluster_time)
+
+        except Exception as e:
+            print(f"Error consuming change stream for {collection}: {str(e)}")
+            raise
+        finally:
+            if owns_producer:
+                producer.close()
+
+    def start(self):
+        """Consume every tracked collection in parallel"""
+        print(f"Consuming change streams for: {', '.join(self.collections)}")
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.collections)) as executor:
+                futures = [executor.submit(self.consume_collection, name) for name in self.collections]
+                try:
+                    # Return as soon as any worker fails, not just the first in the list
+                    done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+                finally:
+                    # Remaining workers notice within max_await_time_ms, flush and checkpoint
+                    self.stop_event.set()
+
+            for future in done:
+                future.result()
+        finally:
+            self.client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consume MongoDB change streams into Event Hub")
+    parser.add_argument('--collections', nargs='+', default=None)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--max-await-time-ms', type=int, default=1000)
+    parser.add_argument('--checkpoint-interval', type=float, default=5.0)
+    parser.add_argument('--restart-on-history-lost', action='store_true',
+                        help="resume from now when a saved resume token is no longer in the oplog")
+    args = parser.parse_args()
+
+    consumer = MongoChangeStreamConsumer(
+        collections=args.collections,
+        batch_size=args.batch_size,
+        max_await_time_ms=args.max_await_time_ms,
+        checkpoint_interval=args.checkpoint_interval,
+        restart_on_history_lost=args.restart_on_history_lost
+    )
+    consumer.start()
@@ -0,0 +1,330 @@
+from azure.identity import DefaultAzureCredential
+from azure.eventhub import EventHubProducerClient, EventData
+import psycopg2
+from psycopg2.extras import LogicalReplicationConnection
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
+import argparse
+import json
+import os
+import select
+import struct
+import time
+from dotenv import load_dotenv
+
+from data_ingestion import DataIngestionPipeline
+from setup_cdc import PUBLISHED_TABLES, PUBLICATION_NAME, REPLICATION_SLOT
+
+load_dotenv()
+
+# pgoutput timestamps are microseconds since the PostgreSQL epoch
+PG_EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+OPERATIONS = {b'I': 'INSERT', b'U': 'UPDATE', b'D': 'DELETE'}
+
+
+class _Buffer:
+    """Sequential reader over a pgoutput message payload"""
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.offset = 0
+
+    def _unpack(self, fmt):
+        value, = struct.unpack_from(fmt, self.payload, self.offset)
+        self.offset += struct.calcsize(fmt)
+        return value
+
+    def byte(self):
+        value = self.payload[self.offset:self.offset + 1]
+        self.offset += 1
+        return value
+
+    def int8(self):
+        return self._unpack('!b')
+
+    def int16(self):
+        return self._unpack('!h')
+
+    def int32(self):
+        return self._unpack('!i')
+
+    def int64(self):
+        return self._unpack('!q')
+
+    def string(self):
+        end = self.payload.index(b'\x00', self.offset)
+        value = self.payload[self.offset:end].decode('utf-8')
+        self.offset = end + 1
+        return value
+
+    def text(self, length):
+        value = self.payload[self.offset:self.offset + length].decode('utf-8')
+        self.offset += length
+        return value
+
+
+class PgOutputDecoder:
+    """Decode pgoutput (protocol version 1) messages into CDC envelopes"""
+
+    def __init__(self, tables):
+        self.tables = set(tables)
+        self.relations = {}
+        self.commit_timestamp = None
+        self.commit_end_lsn = None
+        self.in_transaction = False
+
+    def decode(self, payload):
+        """Decode one message, returning (message_type, envelope or None)"""
+        buf = _Buffer(payload)
+        message_type = buf.byte()
+
+        if message_type == b'B':
+            self.in_transaction = True
+            buf.int64()  # final LSN of the transaction
+            self.commit_timestamp = PG_EPOCH + timedelta(microseconds=buf.int64())
+        elif message_type == b'C':
+            buf.int8()   # flags
+            buf.int64()  # commit LSN
+            self.commit_end_lsn = buf.int64()
+            self.in_transaction = False
+        elif message_type == b'R':
+            self._decode_relation(buf)
+        elif message_type in OPERATIONS:
+            return message_type, self._decode_change(message_type, buf)
+
+        # Type, origin, truncate and logical messages carry no row data
+        return message_type, None
+
+    def _decode_relation(self, buf):
+        relation_id = buf.int32()
+        buf.string()  # namespace
+        table_name = buf.string()
+        buf.int8()    # replica identity setting
+        columns = []
+        for _ in range(buf.int16()):
+            buf.int8()   # flags
+            columns.append(buf.string())
+            buf.int32()  # type OID
+            buf.int32()  # type modifier
+        self.relations[relation_id] = (table_name, columns)
+
+    def _decode_tuple(self, buf, columns):
+        row = {}
+        for index in range(buf.int16()):
+            kind = buf.byte()
+            if kind == b'n':
+                row[columns[index]] = None
+            elif kind == b't':
+                row[columns[index]] = buf.text(buf.int32())
+            # b'u' is an unchanged TOASTed value and is left out of the row
+        return row
+
+    def _decode_change(self, message_type, buf):
+        table_name, columns = self.relations[buf.int32()]
+
+        marker = buf.byte()
+        if message_type == b'U' and marker in (b'K', b'O'):
+            # Skip the old key/row image; the new row follows
+            self._decode_tuple(buf, columns)
+            marker = buf.byte()
+        row = self._decode_tuple(buf, columns)
+
+        if table_name not in self.tables:
+            return None
+
+        return {
+            'table': table_name,
+            'operation': OPERATIONS[message_type],
+            'data': row,
+            'timestamp': self.commit_timestamp.isoformat() if self.commit_timestamp else None
+        }
+
+
+class PostgreSQLReplicationReader:
+    def __init__(self, direct_to_bronze=False, batch_size=500, batch_timeout=1.0):
+        self.pg_conn_string = os.getenv('POSTGRES_CONNECTION_STRING')
+        self.eventhub_namespace = os.getenv('EVENTHUB_NAMESPACE')
+        self.credential = DefaultAzureCredential()
+        self.direct_to_bronze = direct_to_bronze
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+
+        self.decoder = PgOutputDecoder(PUBLISHED_TABLES)
+        self.ingestion = DataIngestionPipeline()
+        self.batch = []
+        self.committed_lsn = 0  # end LSN of the last fully received transaction
+        self.flushed_lsn = 0    # last LSN confirmed back to the server
+        self.oldest_unflushed_commit = None  # commit time of the oldest unflushed transaction
+
+        self.metrics = {
+            'rows_total': 0,
+            'last_flush_at': time.monotonic(),
+            'rows_per_sec': 0.0,
+            'lag_bytes': 0,
+            'lag_seconds': 0.0
+        }
+
+    def handle_message(self, msg):
+        """Decode a replication message and add any row change to the batch"""
+        message_type, envelope = self.decoder.decode(msg.payload)
+
+        if message_type == b'B' and self.oldest_unflushed_commit is None:
+            self.oldest_unflushed_commit = self.decoder.commit_timestamp
+
+        if envelope is not None:
+            self.batch.append(envelope)
+        elif message_type == b'C':
+            self.committed_lsn = self.decoder.commit_end_lsn
+
+    def send_to_eventhub(self, producer, envelopes):
+        """Send envelopes to the postgresql-changes hub in as few batches as possible"""
+        event_batch = producer.create_batch()
+        for envelope in envelopes:
+            event = EventData(json.dumps(envelope))
+            try:
+                event_batch.add(event)
+            except ValueError:
+                # Batch is full: send it and start a new one
+                producer.send_batch(event_batch)
+                event_batch = producer.create_batch()
+                event_batch.add(event)
+
+        if len(event_batch):
+            producer.send_batch(event_batch)
+
+    def write_to_bronze(self, envelopes):
+        """Write envelopes straight to bronze as JSON Lines, one file per table per batch"""
+        by_table = defaultdict(list)
+        for envelope in envelopes:
+            by_table[envelope['table']].append(
+                DataIngestionPipeline.format_postgresql_event(envelope))
+
+        for table_name, records in by_table.items():
+            self.ingestion.write_to_datalake('postgresql', table_name, records)
+
+    def confirmable_lsn(self, cursor, idle):
+        """Return the highest LSN that is safe to confirm to the server"""
+        lsn = self.committed_lsn
+        # With nothing buffered and no transaction open, everything up to the
+        # server's reported WAL end has been received. This keeps the slot moving
+        # when only unpublished tables change, since PostgreSQL 15+ skips empty
+        # transactions in pgoutput and no Commit arrives for them.
+        if idle and not self.batch and not self.decoder.in_transaction:
+            lsn = max(lsn, cursor.wal_end)
+        return lsn
+
+    def flush_batch(self, cursor, producer, idle=False):
+        """Durably write the current batch, then advance confirmed_flush_lsn"""
+        rows = len(self.batch)
+        oldest_commit = self.oldest_unflushed_commit
+        if rows:
+            if self.direct_to_bronze:
+                self.write_to_bronze(self.batch)
+            else:
+                self.send_to_eventhub(producer, self.batch)
+            self.batch = []
+
+        # Only transactions that have fully arrived and been written are confirmed,
+        # so a restart re-delivers anything after the last commit (at-least-once)
+        confirm_lsn = self.confirmable_lsn(cursor, idle)
+        if confirm_lsn > self.flushed_lsn:
+            cursor.send_feedback(flush_lsn=confirm_lsn)
+            self.flushed_lsn = confirm_lsn
+
+        # Whatever is still open carries over as the oldest unflushed transaction
+        self.oldest_unflushed_commit = \
+            self.decoder.commit_timestamp if self.decoder.in_transaction else None
+
+        self.record_metrics(cursor, rows, oldest_commit)
+
+    def record_metrics(self, cursor, rows, oldest_commit):
+        """Update throughput and replication lag measurements"""
+        # Rate over the interval since the previous flush, not a lifetime average
+        now = time.monotonic()
+        elapsed = now - self.metrics['last_flush_at']
+        self.metrics['last_flush_at'] = now
+        self.metrics['rows_total'] += rows
+        self.metrics['rows_per_sec'] = rows / elapsed if elapsed else 0.0
+        # cursor.wal_end is refreshed by keepalives, so it stays current when idle
+        self.metrics['lag_bytes'] = max(cursor.wal_end - self.flushed_lsn, 0)
+        # Time lag is measured from the oldest transaction this flush covered; a
+        # caught-up slot with nothing buffered has no lag however long it idles
+        caught_up = not self.batch and self.flushed_lsn >= cursor.wal_end
+        if oldest_commit is None or (caught_up and not rows):
+            self.metrics['lag_seconds'] = 0.0
+        else:
+            self.metrics['lag_seconds'] = (
+                datetime.now(timezone.utc) - oldest_commit).total_seconds()
+
+        if rows:
+            print(
+                f"Flushed {rows} rows | {self.metrics['rows_per_sec']:.1f} rows/sec | "
+                f"lag {self.metrics['lag_bytes']} bytes, {self.metrics['lag_seconds']:.2f}s"
+            )
+
+    def stream(self):
+        """Consume wastedump_slot until interrupted"""
+        conn = psycopg2.connect(
+            self.pg_conn_string, connection_factory=LogicalReplicationConnection)
+        cursor = conn.cursor()
+
+        producer = None
+        if not self.direct_to_bronze:
+            producer = EventHubProducerClient(
+                fully_qualified_namespace=f"{self.eventhub_namespace}.servicebus.windows.net",
+                eventhub_name="postgresql-changes",
+                credential=self.credential
+            )
+
+        try:
+            cursor.start_replication(
+                slot_name=REPLICATION_SLOT,
+                decode=False,
+                options={'proto_version': '1', 'publication_names': PUBLICATION_NAME},
+                status_interval=10
+            )
+            print(f"Streaming from {REPLICATION_SLOT} "
+                  f"({'direct to bronze' if self.direct_to_bronze else 'via Event Hub'})")
+
+            last_flush = time.monotonic()
+            while True:
+                msg = cursor.read_message()
+                if msg is not None:
+                    self.handle_message(msg)
+
+                idle = msg is None
+                timed_out = time.monotonic() - last_flush >= self.batch_timeout
+                if len(self.batch) >= self.batch_size or (
+                        timed_out and (self.batch or
+                                       self.confirmable_lsn(cursor, idle) > self.flushed_lsn)):
+                    self.flush_batch(cursor, producer, idle)
+                    last_flush = time.monotonic()
+
+                if msg is None:
+                    select.select([cursor], [], [], self.batch_timeout)
+
+        except KeyboardInterrupt:
+            self.flush_batch(cursor, producer)
+        finally:
+            if producer is not None:
+                producer.close()
+            cursor.close()
+            conn.close()
+            print(f"Replication reader stopped after {self.metrics['rows_total']} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream PostgreSQL changes from wastedump_slot")
+    parser.add_argument('--direct-to-bronze', action='store_true',
+                        help="write batches straight to the bronze Data Lake, skipping Event Hub")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--batch-timeout', type=float, default=1.0)
+    args = parser.parse_args()
+
+    reader = PostgreSQLReplicationReader(
+        direct_to_bronze=args.direct_to_bronze,
+        batch_size=args.batch_size,
+        batch_timeout=args.batch_timeout
+    )
+    reader.stream()
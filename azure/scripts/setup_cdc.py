@@ -8,6 +8,22 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Tables published for logical replication (Prisma metadata excluded)
+PUBLISHED_TABLES = [
+    'users', 'user_profiles', 'merchants', 'products',
+    'orders', 'order_items', 'stokvels', 'stokvel_members',
+    'subscription_plans', 'user_subscriptions',
+    'monitors', 'mobile_tellings', 'sponsors'
+]
+PUBLICATION_NAME = 'wastedump_pub'
+REPLICATION_SLOT = 'wastedump_slot'
+
+# MongoDB collections captured through change streams
+TRACKED_COLLECTIONS = [
+    'user_activities', 'logs', 'chat_messages', 'notifications',
+    'waste_reports', 'community_feed', 'analytics'
+]
+
 class DatabaseCDCSetup:
     def __init__(self):
         self.pg_conn_string = os.getenv('POSTGRES_CONNECTION_STRING')
@@ -29,21 +45,18 @@ class DatabaseCDCSetup:
             """)
             
             # Create publication for tables (excluding Prisma metadata)
-            cur.execute("""
-                CREATE PUBLICATION wastedump_pub FOR TABLE 
-                    users, user_profiles, merchants, products, 
-                    orders, order_items, stokvels, stokvel_members,
-                    subscription_plans, user_subscriptions,
-                    monitors, mobile_tellings, sponsors;
+            cur.execute(f"""
+                CREATE PUBLICATION {PUBLICATION_NAME} FOR TABLE 
+                    {', '.join(PUBLISHED_TABLES)};
             """)
             
             # Create replication slot
             cur.execute("""
                 SELECT pg_create_logical_replication_slot(
-                    'wastedump_slot',
+                    %s,
                     'pgoutput'
                 );
-            """)
+            """, (REPLICATION_SLOT,))
             
             conn.commit()
             print("PostgreSQL CDC setup completed successfully")
@@ -67,23 +80,13 @@ class DatabaseCDCSetup:
             pipeline = [{
                 '$match': {
                     'operationType': {'$in': ['insert', 'update', 'delete']},
-                    'ns.coll': {
-                        '$in': [
-                            'user_activities',
-                            'logs',
-                            'chat_messages',
-                            'notifications',
-                            'waste_reports',
-                            'community_feed',
-                            'analytics'
-                        ]
-                    }
+                    'ns.coll': {'$in': TRACKED_COLLECTIONS}
                 }
             }]
             
-            # Test change stream
-            change_stream = client.wastedump.watch(pipeline)
-            print("MongoDB change stream initialized successfully")
+            # Test change stream; consumption lives in mongo_changestream_consumer.py
+            with client.wastedump.watch(pipeline):
+                print("MongoDB change stream initialized successfully")
             
         except Exception as e:
             print(f"Error setting up MongoDB change stream: {str(e)}")
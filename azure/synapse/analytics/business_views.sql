@@ -59,4 +59,20 @@ FROM
     LEFT JOIN silver.products p ON wc.category_id = p.category_id
     LEFT JOIN silver.order_items oi ON p.product_id = oi.product_id
 GROUP BY 
-    wc.category_name; 
\ No newline at end of file
+    wc.category_name; 
+
+-- 5. Metrics Rollup View (day/week/month, overall and per merchant / user_type)
+-- Filter on grain, dimension and period_start instead of scanning orders_enriched
+CREATE OR ALTER VIEW [analytics].[vw_Metrics_Rollup]
+AS
+SELECT 
+    grain,
+    period_start,
+    dimension,
+    dimension_value,
+    total_revenue,
+    total_orders,
+    unique_customers,
+    average_order_value
+FROM 
+    gold.metrics_rollup;